@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+def _configure_sqlite(sender, connection, **kwargs):
+    """
+    WAL lets reads proceed during a write; synchronous=NORMAL is durable enough under WAL.
+    Temp tables/indices stay in memory and up to 128 MiB of the file is read via mmap.
+    """
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.execute('PRAGMA temp_store=MEMORY')
+            cursor.execute('PRAGMA mmap_size=134217728')
 
 
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'analytics'
\ No newline at end of file
+    name = 'analytics'
+
+    def ready(self):
+        # The 4.2 SQLite backend has no OPTIONS['init_command'], so apply pragmas per connection
+        connection_created.connect(_configure_sqlite)
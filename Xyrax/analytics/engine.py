@@ -2,28 +2,87 @@
 Core analytics engine for Instra.
 Handles impression prediction, viral scoring, and AI strategy generation.
 """
-import math
+import functools
 import random
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
+
+import numpy as np
 
 
 # ── Impression prediction ────────────────────────────────────────────────────
 
-def predict_impressions(inputs: dict, history: list[dict]) -> int:
+# Caption and hashtag multipliers as lookup tables indexed by the clamped count:
+# captions of 100–220 chars earn 1.08 and >400 lose to 0.96 (index 401 = "over 400");
+# 5–25 hashtags earn 1.05 and >30 drop to 0.97 (index 31 = "over 30").
+_CAP_MAX = 401
+_HASH_MAX = 31
+
+_CAP_LUT = np.ones(_CAP_MAX + 1)
+_CAP_LUT[100:221] = 1.08
+_CAP_LUT[_CAP_MAX] = 0.96
+
+_HASH_LUT = np.ones(_HASH_MAX + 1)
+_HASH_LUT[5:26] = 1.05
+_HASH_LUT[_HASH_MAX] = 0.97
+
+# Viral-score hashtag points: 10 for 10–25 tags, 7 for 5–30, otherwise 3
+_HASH_SCORE_LUT = np.full(_HASH_MAX + 1, 3)
+_HASH_SCORE_LUT[5:31] = 7
+_HASH_SCORE_LUT[10:26] = 10
+
+# Plain-Python copies for the scalar path (indexing an ndarray boxes a numpy scalar)
+_CAP_MULTS = tuple(_CAP_LUT.tolist())
+_HASH_MULTS = tuple(_HASH_LUT.tolist())
+_HASH_SCORES = tuple(_HASH_SCORE_LUT.tolist())
+
+
+def _bonuses(caption_length, hashtags) -> tuple:
+    """(caption multiplier, hashtag multiplier, hashtag viral points) for one post."""
+    c = min(max(caption_length, 0), _CAP_MAX)
+    h = min(max(hashtags, 0), _HASH_MAX)
+    return _CAP_MULTS[c], _HASH_MULTS[h], _HASH_SCORES[h]
+
+
+def predict_impressions(inputs: dict, history) -> int:
     """
     Weighted formula combining engagement signals.
     When history is available, calibrates to the session's historical average.
     """
-    likes = inputs.get('likes', 0)
-    saves = inputs.get('saves', 0)
-    comments = inputs.get('comments', 0)
-    shares = inputs.get('shares', 0)
-    follows = inputs.get('follows', 0)
-    profile_visits = inputs.get('profile_visits', 0)
-    caption_length = inputs.get('caption_length', 0)
-    hashtags = inputs.get('hashtags', 0)
-    reposts = inputs.get('reposts', 0)
+    key = tuple(inputs.get(k, 0) for k in INPUT_COLUMNS)
+    if not history:
+        return _predict_no_history(key)
+    return _predict_with_history(key, HistoryColumns.coerce(history))
+
+
+@functools.lru_cache(maxsize=1024)
+def _predict_no_history(key: tuple) -> int:
+    """First post of a session: the formula alone, memoised on the input tuple."""
+    return max(_impression_core(*key), 100)
+
+
+def _predict_with_history(key: tuple, history: 'HistoryColumns') -> int:
+    likes, saves = key[0], key[1]
+    impressions = _impression_core(*key)
+
+    # Calibrate against historical average
+    hist_imps = history.predicted_impressions
+    hist_imps = hist_imps[hist_imps > 0]
+    if hist_imps.size:
+        hist_avg = hist_imps.mean()
+        # Blend: 60% formula, 40% scaled from historical
+        saves_ratio = saves / max(likes, 1)
+        scale = 1 + (saves_ratio - 0.5) * 0.4
+        calibrated = hist_avg * scale
+        impressions = int(0.6 * impressions + 0.4 * calibrated)
+
+    return max(impressions, 100)
+
 
+def _impression_core(likes, saves, comments, shares, follows,
+                     profile_visits, caption_length, hashtags, reposts) -> int:
+    """Uncalibrated formula impressions; plain numbers in, no dict access."""
     # Base engagement score
     base = (
         likes * 1.0 +
@@ -35,45 +94,29 @@ def predict_impressions(inputs: dict, history: list[dict]) -> int:
         reposts * 5.5
     )
 
-    # Caption sweet-spot bonus (100–220 chars)
-    if 100 <= caption_length <= 220:
-        base *= 1.08
-    elif caption_length > 400:
-        base *= 0.96
-
-    # Hashtag sweet-spot bonus (5–25 tags)
-    if 5 <= hashtags <= 25:
-        base *= 1.05
-    elif hashtags > 30:
-        base *= 0.97
+    # Caption and hashtag sweet-spot bonuses
+    cap_mult, hash_mult, _ = _bonuses(caption_length, hashtags)
 
     # Convert to estimated impressions
-    impressions = int(base * 12.5 + 400)
-
-    # Calibrate against historical average if we have data
-    if history:
-        hist_imps = [p.get('predicted_impressions', 0) for p in history if p.get('predicted_impressions', 0) > 0]
-        if hist_imps:
-            hist_avg = sum(hist_imps) / len(hist_imps)
-            # Blend: 60% formula, 40% scaled from historical
-            saves_ratio = saves / max(likes, 1)
-            scale = 1 + (saves_ratio - 0.5) * 0.4
-            calibrated = hist_avg * scale
-            impressions = int(0.6 * impressions + 0.4 * calibrated)
-
-    return max(impressions, 100)
+    return int(base * cap_mult * hash_mult * 12.5 + 400)
 
 
 def compute_viral_score(inputs: dict) -> float:
     """0–100 composite quality score."""
-    likes = inputs.get('likes', 0)
-    saves = inputs.get('saves', 0)
-    comments = inputs.get('comments', 0)
-    shares = inputs.get('shares', 0)
-    follows = inputs.get('follows', 0)
-    profile_visits = inputs.get('profile_visits', 0)
-    hashtags = inputs.get('hashtags', 0)
+    return _viral_core(
+        inputs.get('likes', 0),
+        inputs.get('saves', 0),
+        inputs.get('comments', 0),
+        inputs.get('shares', 0),
+        inputs.get('follows', 0),
+        inputs.get('profile_visits', 0),
+        inputs.get('caption_length', 0),
+        inputs.get('hashtags', 0),
+    )
+
 
+def _viral_core(likes, saves, comments, shares, follows,
+                profile_visits, caption_length, hashtags) -> float:
     total_eng = likes + saves + comments + shares + follows
     if total_eng == 0:
         return 0.0
@@ -92,12 +135,7 @@ def compute_viral_score(inputs: dict) -> float:
     follow_score = min((follows / max(profile_visits, 1)) * 100 * 0.3, 15) if profile_visits > 0 else 0
 
     # Hashtag score
-    if 10 <= hashtags <= 25:
-        hashtag_score = 10
-    elif 5 <= hashtags <= 30:
-        hashtag_score = 7
-    else:
-        hashtag_score = 3
+    _, _, hashtag_score = _bonuses(caption_length, hashtags)
 
     raw = saves_score + comments_score + shares_score + follow_score + hashtag_score
     return round(min(raw, 100), 1)
@@ -123,15 +161,105 @@ def compute_follow_rate(inputs: dict) -> float:
     return round((follows / profile_visits) * 100, 1)
 
 
+# ── History columns ──────────────────────────────────────────────────────────
+
+INPUT_COLUMNS = (
+    'likes', 'saves', 'comments', 'shares', 'follows',
+    'profile_visits', 'caption_length', 'hashtags', 'reposts',
+)
+
+HISTORY_COLUMNS = INPUT_COLUMNS + ('predicted_impressions', 'viral_score')
+
+# viral_score is held as int16 fixed point in tenths (scores carry one decimal)
+VIRAL_SCALE = 10
+
+
+@dataclass
+class HistoryColumns:
+    """
+    Column-oriented view of a post history: one contiguous array per field,
+    built once per request so reductions run over arrays instead of dicts.
+    `viral_score` is stored in tenths as int16; use viral_scores() for values.
+    """
+    __slots__ = HISTORY_COLUMNS
+
+    likes: np.ndarray
+    saves: np.ndarray
+    comments: np.ndarray
+    shares: np.ndarray
+    follows: np.ndarray
+    profile_visits: np.ndarray
+    caption_length: np.ndarray
+    hashtags: np.ndarray
+    reposts: np.ndarray
+    predicted_impressions: np.ndarray
+    viral_score: np.ndarray
+
+    @classmethod
+    def from_dicts(cls, history: list[dict]) -> 'HistoryColumns':
+        n = len(history)
+        columns = [
+            np.fromiter((p.get(k, 0) for p in history), dtype=np.int64, count=n)
+            for k in HISTORY_COLUMNS[:-1]
+        ]
+        columns.append(np.fromiter(
+            (round(p.get('viral_score', 0) * VIRAL_SCALE) for p in history),
+            dtype=np.int16,
+            count=n,
+        ))
+        return cls(*columns)
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple]) -> 'HistoryColumns':
+        """Build from value tuples in HISTORY_COLUMNS order (e.g. a `values_list` query)."""
+        table = np.array(rows, dtype=np.float64).reshape(-1, len(HISTORY_COLUMNS))
+        columns = [table[:, i].astype(np.int64) for i in range(len(HISTORY_COLUMNS) - 1)]
+        columns.append(np.rint(table[:, -1] * VIRAL_SCALE).astype(np.int16))
+        return cls(*columns)
+
+    @classmethod
+    def coerce(cls, history) -> 'HistoryColumns':
+        """Pass HistoryColumns through; convert a list of post dicts."""
+        return history if isinstance(history, cls) else cls.from_dicts(history)
+
+    def __len__(self) -> int:
+        return self.likes.size
+
+    def concat(self, other: 'HistoryColumns') -> 'HistoryColumns':
+        """New HistoryColumns with the rows of `other` after these."""
+        return HistoryColumns(*(
+            np.concatenate((getattr(self, k), getattr(other, k)))
+            for k in HISTORY_COLUMNS
+        ))
+
+    def append(self, post: dict) -> 'HistoryColumns':
+        """New HistoryColumns with `post` added as the last row."""
+        return self.concat(HistoryColumns.from_dicts([post]))
+
+    def viral_scores(self) -> np.ndarray:
+        """Viral scores as float64 (exactly the one-decimal values that were stored)."""
+        return self.viral_score / VIRAL_SCALE
+
+
 # ── Historical averages ──────────────────────────────────────────────────────
 
-def compute_averages(history: list[dict]) -> dict:
-    if not history:
+AVERAGE_COLUMNS = ('likes', 'saves', 'comments', 'shares', 'predicted_impressions')
+
+
+def compute_averages(history) -> dict:
+    """
+    Per-session means of likes/saves/comments/shares and non-zero impressions.
+    `history` is HistoryColumns or a list of post dicts.
+    """
+    if len(history) == 0:
         return {'likes': 0, 'saves': 0, 'comments': 0, 'shares': 0, 'impressions': 0}
-    keys = ['likes', 'saves', 'comments', 'shares']
-    avgs = {k: round(sum(p.get(k, 0) for p in history) / len(history)) for k in keys}
-    imp_vals = [p.get('predicted_impressions', 0) for p in history if p.get('predicted_impressions', 0) > 0]
-    avgs['impressions'] = round(sum(imp_vals) / len(imp_vals)) if imp_vals else 0
+    hc = HistoryColumns.coerce(history)
+    columns = [getattr(hc, k) for k in AVERAGE_COLUMNS]
+
+    avgs = {k: int(col.mean().round()) for k, col in zip(AVERAGE_COLUMNS[:4], columns)}
+    imp = columns[4]
+    imp = imp[imp > 0]
+    avgs['impressions'] = int(imp.mean().round()) if imp.size else 0
     return avgs
 
 
@@ -151,102 +279,132 @@ POSTING_TIMES = [
 ]
 
 
+# Top-3 slots for every seed in 0..0xFFF, precomputed with the original
+# per-call shuffle so lookups are O(1) and allocation-free.
+_TOP3_MASK = 0xFFF
+
+
+def _build_top3_table() -> tuple:
+    table = []
+    for seed in range(_TOP3_MASK + 1):
+        shuffled = POSTING_TIMES[:]
+        random.Random(seed).shuffle(shuffled)
+        table.append(tuple(shuffled[:3]))
+    return tuple(table)
+
+
+_TOP3_TABLE = _build_top3_table()
+
+
 def get_best_times(inputs: dict) -> list[dict]:
     """Return top 3 posting slots; the top one is always marked BEST."""
     saves = inputs.get('saves', 0)
     comments = inputs.get('comments', 0)
     hashtags = inputs.get('hashtags', 0)
 
-    # Pseudo-deterministic shuffle based on post metrics
-    seed = saves * 7 + comments * 13 + hashtags * 3
-    rng = random.Random(seed)
-    shuffled = POSTING_TIMES[:]
-    rng.shuffle(shuffled)
-
-    top3 = shuffled[:3]
+    # Pseudo-deterministic pick based on post metrics
+    a, b, c = _TOP3_TABLE[(saves * 7 + comments * 13 + hashtags * 3) & _TOP3_MASK]
     return [
-        {'slot': slot, 'label': 'BEST' if i == 0 else 'GOOD'}
-        for i, slot in enumerate(top3)
+        {'slot': a, 'label': 'BEST'},
+        {'slot': b, 'label': 'GOOD'},
+        {'slot': c, 'label': 'GOOD'},
     ]
 
 
 # ── Forecast report (multi-post) ─────────────────────────────────────────────
 
-def smooth(values: list[float], window: int = 3) -> list[float]:
-    out = []
-    for i in range(len(values)):
-        start = max(0, i - window + 1)
-        chunk = values[start:i + 1]
-        out.append(round(sum(chunk) / len(chunk), 1))
-    return out
-
-
-def trend_direction(values: list[float]) -> str:
-    if len(values) < 2:
-        return 'stable'
-    first_half = values[:len(values) // 2]
-    second_half = values[len(values) // 2:]
-    avg_first = sum(first_half) / len(first_half)
-    avg_second = sum(second_half) / len(second_half)
-    diff = avg_second - avg_first
-    if diff > avg_first * 0.05:
-        return 'improving'
-    if diff < -avg_first * 0.05:
-        return 'declining'
-    return 'stable'
+def smooth(values, window: int = 3) -> list[float]:
+    """
+    Trailing moving average via prefix sums: O(n) regardless of window.
+    Values are unrounded; round at the point of serialisation.
+    """
+    v = np.asarray(values, dtype=np.float64)
+    cs = np.empty(v.size + 1)
+    cs[0] = 0
+    np.cumsum(v, out=cs[1:])
+    idx = np.arange(1, v.size + 1)
+    lo = np.maximum(idx - window, 0)
+    return ((cs[idx] - cs[lo]) / (idx - lo)).tolist()
+
+
+def trend_direction(values) -> str:
+    return trend_directions_batch(np.asarray(values, dtype=np.float64)[np.newaxis, :])[0]
+
+
+def trend_directions_batch(series_stack: np.ndarray) -> list[str]:
+    """
+    trend_direction for every row of a (k, n) stack of equal-length series:
+    second-half mean vs first-half mean, with a ±5% dead band.
+    """
+    stack = np.asarray(series_stack, dtype=np.float64)
+    if stack.shape[1] < 2:
+        return ['stable'] * stack.shape[0]
+    half = stack.shape[1] // 2
+    first = stack[:, :half].mean(axis=1)
+    second = stack[:, half:].mean(axis=1)
+    diff = second - first
+    return np.select(
+        [diff > first * 0.05, diff < -first * 0.05],
+        ['improving', 'declining'],
+        'stable',
+    ).tolist()
+
+
+def _ls_slope(values: np.ndarray) -> float:
+    """Least-squares slope of `values` against post index (uses every point)."""
+    x = np.arange(values.size, dtype=np.float64)
+    x -= x.mean()
+    return float((x * (values - values.mean())).sum() / (x * x).sum())
 
 
 def build_forecast_report(history, current_inputs, current_imp):
     """Build a multi-post forecast report. Requires at least 2 historical posts."""
-    all_posts = list(history) + [{**current_inputs, 'predicted_impressions': current_imp}]
-    if len(all_posts) < 2:
+    hc = HistoryColumns.coerce(history).append({**current_inputs, 'predicted_impressions': current_imp})
+    if len(hc) < 2:
         return None
 
-    imps = [p.get('predicted_impressions', 0) for p in all_posts]
-    saves_ratios = [p.get('saves', 0) / max(p.get('likes', 1), 1) for p in all_posts]
-    viral_scores = [p.get('viral_score', 0) for p in all_posts]
+    imps = hc.predicted_impressions.astype(np.float64)
+    saves_ratios = hc.saves / np.maximum(hc.likes, 1)
+    viral_scores = hc.viral_scores()
 
     imp_smoothed = smooth(imps)
-    imp_trend = trend_direction(imps)
-
-    saves_trend = trend_direction(saves_ratios)
-    eng_trend = trend_direction([p.get('likes', 0) + p.get('comments', 0) for p in all_posts])
+    imp_trend, saves_trend, eng_trend = trend_directions_batch(
+        np.vstack([imps, saves_ratios, hc.likes + hc.comments])
+    )
 
-    # Simple linear extrapolation for next post
+    # Linear extrapolation for next post along the least-squares trend
     if len(imps) >= 2:
-        slope = (imps[-1] - imps[0]) / max(len(imps) - 1, 1)
+        slope = _ls_slope(imps)
         next_imp = max(int(imps[-1] + slope * 0.5), 100)
     else:
         next_imp = imps[-1]
 
     if len(viral_scores) >= 2:
-        v_slope = (viral_scores[-1] - viral_scores[0]) / max(len(viral_scores) - 1, 1)
-        next_viral = round(min(viral_scores[-1] + v_slope * 0.5, 100), 1)
+        v_slope = _ls_slope(viral_scores)
+        next_viral = round(min(float(viral_scores[-1] + v_slope * 0.5), 100), 1)
     else:
-        next_viral = viral_scores[-1] if viral_scores else 0
+        next_viral = float(viral_scores[-1]) if viral_scores.size else 0
 
     # Optimal hashtag count from best-performing posts
-    hashtag_vals = [p.get('hashtags', 0) for p in all_posts if p.get('hashtags', 0) > 0]
-    opt_hashtags = round(sum(hashtag_vals) / len(hashtag_vals)) if hashtag_vals else 20
+    hashtag_vals = hc.hashtags[hc.hashtags > 0]
+    opt_hashtags = round(float(hashtag_vals.mean())) if hashtag_vals.size else 20
 
     # Consistency rating
     if len(imps) >= 3:
-        avg_imp = sum(imps) / len(imps)
-        variance = sum((x - avg_imp) ** 2 for x in imps) / len(imps)
-        cv = math.sqrt(variance) / max(avg_imp, 1)
+        cv = imps.std() / max(imps.mean(), 1)
         consistency = 'High' if cv < 0.25 else 'Medium' if cv < 0.5 else 'Low'
     else:
         consistency = 'Building'
 
     return {
-        'post_count': len(all_posts),
+        'post_count': len(hc),
         'impression_trend': imp_trend,
-        'imp_smoothed': imp_smoothed,
+        'imp_smoothed': [round(v, 1) for v in imp_smoothed],
         'next_imp_forecast': next_imp,
         'next_viral_forecast': next_viral,
         'opt_hashtags': opt_hashtags,
         'saves_ratio': {
-            'values': [round(r, 3) for r in saves_ratios],
+            'values': [round(r, 3) for r in saves_ratios.tolist()],
             'direction': saves_trend,
         },
         'engagement_velocity': {
@@ -258,21 +416,44 @@ def build_forecast_report(history, current_inputs, current_imp):
 
 # ── AI strategy (rule-based, no LLM required) ────────────────────────────────
 
-def generate_ai_strategy(inputs: dict, viral_score: float, impressions: int, avgs: dict) -> dict:
-    likes = inputs.get('likes', 0)
-    saves = inputs.get('saves', 0)
-    comments = inputs.get('comments', 0)
-    shares = inputs.get('shares', 0)
-    follows = inputs.get('follows', 0)
-    profile_visits = inputs.get('profile_visits', 0)
-    caption_length = inputs.get('caption_length', 0)
-    hashtags = inputs.get('hashtags', 0)
-    reposts = inputs.get('reposts', 0)
+_STRENGTHS = (
+    'strong saves (people are bookmarking your content)',
+    'high comment rate (great conversation starter)',
+    'solid share rate (content is spreading)',
+    'excellent follow conversion from profile visits',
+    'getting reposts (very strong signal)',
+)
+_WEAKNESSES = (
+    'saves are low — your content isn\'t being saved for later',
+    'very few comments — add a direct question in your caption',
+    'zero shares — make it more quote-worthy or surprising',
+    'people visit your profile but don\'t follow — bio or grid may need work',
+)
+
+
+def _diagnosis_text(sflags: int, wflags: int) -> str:
+    strengths = [p for i, p in enumerate(_STRENGTHS) if sflags >> i & 1]
+    weaknesses = [p for i, p in enumerate(_WEAKNESSES) if wflags >> i & 1]
 
-    saves_ratio = saves / max(likes, 1)
-    comment_ratio = comments / max(likes, 1)
-    follow_conv = follows / max(profile_visits, 1) if profile_visits > 0 else 0
+    if strengths and weaknesses:
+        return f"Your post shows {', '.join(strengths[:2])}. The main area to improve: {weaknesses[0]}."
+    if strengths:
+        return f"Strong post: {', '.join(strengths[:2])}. Keep replicating what's working."
+    if weaknesses:
+        return f"This post is underperforming. Key issues: {'; '.join(weaknesses[:2])}."
+    return "Solid baseline metrics. Focus on saves and comments to push into viral range."
 
+
+# Every strength/weakness combination rendered once: _DIAGNOSES[sflags][wflags]
+_DIAGNOSES = tuple(
+    tuple(_diagnosis_text(sf, wf) for wf in range(1 << len(_WEAKNESSES)))
+    for sf in range(1 << len(_STRENGTHS))
+)
+
+
+def generate_ai_strategy(inputs: dict, viral_score: float, impressions: int, avgs: dict,
+                         times: Optional[list[dict]] = None) -> dict:
+    """Rule-based strategy; pass `times` if the caller already has get_best_times(inputs)."""
     # Viral label
     if viral_score >= 65:
         viral_label = 'High Potential'
@@ -281,41 +462,54 @@ def generate_ai_strategy(inputs: dict, viral_score: float, impressions: int, avg
     else:
         viral_label = 'Low Potential'
 
-    # Diagnosis
-    strengths = []
-    weaknesses = []
+    # Diagnosis and levers depend only on the raw inputs, so they are memoised
+    core = _strategy_core(tuple(inputs.get(k, 0) for k in INPUT_COLUMNS))
 
-    if saves_ratio > 0.5:
-        strengths.append('strong saves (people are bookmarking your content)')
-    elif saves_ratio < 0.2:
-        weaknesses.append('saves are low — your content isn\'t being saved for later')
+    # Best time recommendation
+    if times is None:
+        times = get_best_times(inputs)
+    best_time = f"Best window for this type of content: {times[0]['slot']}. Secondary option: {times[1]['slot']}."
 
-    if comment_ratio > 0.1:
-        strengths.append('high comment rate (great conversation starter)')
-    elif comment_ratio < 0.03:
-        weaknesses.append('very few comments — add a direct question in your caption')
+    # Projections
+    projected_25 = int(impressions * 1.25)
+    projected_opt = int(impressions * 1.60)
 
-    if shares > likes * 0.05:
-        strengths.append('solid share rate (content is spreading)')
-    elif shares == 0:
-        weaknesses.append('zero shares — make it more quote-worthy or surprising')
+    return {
+        'viral_label': viral_label,
+        'diagnosis': core['diagnosis'],
+        'growth_levers': list(core['growth_levers']),
+        'best_times': times,
+        'best_time': best_time,
+        'projected_25': projected_25,
+        'projected_opt': projected_opt,
+    }
 
-    if follow_conv > 0.15:
-        strengths.append('excellent follow conversion from profile visits')
-    elif profile_visits > 0 and follow_conv < 0.05:
-        weaknesses.append('people visit your profile but don\'t follow — bio or grid may need work')
 
-    if reposts > 0:
-        strengths.append('getting reposts (very strong signal)')
+@functools.lru_cache(maxsize=512)
+def _strategy_core(key: tuple) -> dict:
+    """Input-only part of the strategy; `key` holds the inputs in INPUT_COLUMNS order."""
+    likes, saves, comments, shares, follows, profile_visits, caption_length, hashtags, reposts = key
 
-    if strengths and weaknesses:
-        diagnosis = f"Your post shows {', '.join(strengths[:2])}. The main area to improve: {weaknesses[0]}."
-    elif strengths:
-        diagnosis = f"Strong post: {', '.join(strengths[:2])}. Keep replicating what's working."
-    elif weaknesses:
-        diagnosis = f"This post is underperforming. Key issues: {'; '.join(weaknesses[:2])}."
-    else:
-        diagnosis = "Solid baseline metrics. Focus on saves and comments to push into viral range."
+    saves_ratio = saves / max(likes, 1)
+    comment_ratio = comments / max(likes, 1)
+    follow_conv = follows / max(profile_visits, 1) if profile_visits > 0 else 0
+
+    # Diagnosis: one bit per signal, strengths taking precedence over the
+    # matching weakness, then a lookup into the pre-rendered sentences
+    sflags = (
+        (saves_ratio > 0.5) |
+        (comment_ratio > 0.1) << 1 |
+        (shares > likes * 0.05) << 2 |
+        (follow_conv > 0.15) << 3 |
+        (reposts > 0) << 4
+    )
+    wflags = (
+        (saves_ratio < 0.2) |
+        (comment_ratio < 0.03) << 1 |
+        (shares == 0) << 2 |
+        (profile_visits > 0 and follow_conv < 0.05) << 3
+    ) & ~sflags
+    diagnosis = _DIAGNOSES[sflags][wflags]
 
     # Growth levers
     levers = []
@@ -349,20 +543,7 @@ def generate_ai_strategy(inputs: dict, viral_score: float, impressions: int, avg
         levers.append(d)
     levers = levers[:3]
 
-    # Best time recommendation
-    times = get_best_times(inputs)
-    best_time = f"Best window for this type of content: {times[0]['slot']}. Secondary option: {times[1]['slot']}."
-
-    # Projections
-    projected_25 = int(impressions * 1.25)
-    projected_opt = int(impressions * 1.60)
-
     return {
-        'viral_label': viral_label,
         'diagnosis': diagnosis,
-        'growth_levers': levers,
-        'best_times': times,
-        'best_time': best_time,
-        'projected_25': projected_25,
-        'projected_opt': projected_opt,
+        'growth_levers': tuple(levers),
     }
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-14 21:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='session_key',
+            field=models.CharField(max_length=120),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['session_key', 'created_at'], name='post_sess_created_idx'),
+        ),
+    ]
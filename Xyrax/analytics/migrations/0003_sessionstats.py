@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-14 21:45
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_session_stats(apps, schema_editor):
+    Post = apps.get_model('analytics', 'Post')
+    SessionStats = apps.get_model('analytics', 'SessionStats')
+    totals = (
+        Post.objects.values('session_key')
+        .annotate(
+            count=Count('id'),
+            imp_count=Count('id', filter=Q(predicted_impressions__gt=0)),
+            sum_likes=Sum('likes'),
+            sum_saves=Sum('saves'),
+            sum_comments=Sum('comments'),
+            sum_shares=Sum('shares'),
+            sum_follows=Sum('follows'),
+            sum_hashtags=Sum('hashtags'),
+            sum_impressions=Sum('predicted_impressions'),
+            sum_viral_score=Sum('viral_score'),
+        )
+        .order_by()
+    )
+    SessionStats.objects.bulk_create(SessionStats(**row) for row in totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_post_sess_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=120, unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('imp_count', models.IntegerField(default=0)),
+                ('sum_likes', models.BigIntegerField(default=0)),
+                ('sum_saves', models.BigIntegerField(default=0)),
+                ('sum_comments', models.BigIntegerField(default=0)),
+                ('sum_shares', models.BigIntegerField(default=0)),
+                ('sum_follows', models.BigIntegerField(default=0)),
+                ('sum_hashtags', models.BigIntegerField(default=0)),
+                ('sum_impressions', models.BigIntegerField(default=0)),
+                ('sum_viral_score', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_session_stats, migrations.RunPython.noop),
+    ]
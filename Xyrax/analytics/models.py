@@ -1,8 +1,20 @@
+import operator
+
 from django.db import models
+from django.db.models import F
+
+
+_DICT_FIELDS = (
+    'likes', 'saves', 'comments', 'shares', 'follows',
+    'profile_visits', 'caption_length', 'hashtags', 'reposts',
+    'predicted_impressions', 'viral_score', 'eng_rate',
+    'follow_rate', 'ai_viral_label',
+)
+_get_dict_fields = operator.attrgetter(*_DICT_FIELDS)
 
 
 class Post(models.Model):
-    session_key = models.CharField(max_length=120, db_index=True)
+    session_key = models.CharField(max_length=120)
     created_at = models.DateTimeField(auto_now_add=True)
 
     # Inputs
@@ -25,21 +37,72 @@ class Post(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Every view filters by session and orders by creation time
+            models.Index(fields=['session_key', 'created_at'], name='post_sess_created_idx'),
+        ]
 
     def to_dict(self):
+        """Serialise a single instance; bulk reads should use `.values()` instead."""
+        return dict(zip(_DICT_FIELDS, _get_dict_fields(self)))
+
+
+class SessionStats(models.Model):
+    """
+    Running totals over a session's posts, bumped in the same transaction as each
+    new Post so averages are O(1) to read instead of a scan of the history.
+    """
+    session_key = models.CharField(max_length=120, unique=True)
+    count = models.IntegerField(default=0)
+    imp_count = models.IntegerField(default=0)  # posts with predicted_impressions > 0
+
+    sum_likes = models.BigIntegerField(default=0)
+    sum_saves = models.BigIntegerField(default=0)
+    sum_comments = models.BigIntegerField(default=0)
+    sum_shares = models.BigIntegerField(default=0)
+    sum_follows = models.BigIntegerField(default=0)
+    sum_hashtags = models.BigIntegerField(default=0)
+    sum_impressions = models.BigIntegerField(default=0)
+    sum_viral_score = models.FloatField(default=0)
+
+    @classmethod
+    def record(cls, post):
+        """Add `post` to its session's totals; call inside the transaction that created it."""
+        cls.objects.get_or_create(session_key=post.session_key)
+        cls.objects.filter(session_key=post.session_key).update(
+            count=F('count') + 1,
+            imp_count=F('imp_count') + (post.predicted_impressions > 0),
+            sum_likes=F('sum_likes') + post.likes,
+            sum_saves=F('sum_saves') + post.saves,
+            sum_comments=F('sum_comments') + post.comments,
+            sum_shares=F('sum_shares') + post.shares,
+            sum_follows=F('sum_follows') + post.follows,
+            sum_hashtags=F('sum_hashtags') + post.hashtags,
+            sum_impressions=F('sum_impressions') + post.predicted_impressions,
+            sum_viral_score=F('sum_viral_score') + post.viral_score,
+        )
+
+    @classmethod
+    def version(cls, session_key):
+        """
+        (row id, post count) for `session_key`, (0, 0) if it has no posts. Changes on every
+        recorded post, and after a clear (the row is recreated with a new id).
+        """
+        return cls.objects.filter(session_key=session_key).values_list('id', 'count').first() or (0, 0)
+
+    @classmethod
+    def for_session(cls, session_key):
+        """Totals for `session_key`; an unsaved all-zero row if it has no posts."""
+        return cls.objects.filter(session_key=session_key).first() or cls(session_key=session_key)
+
+    def averages(self):
+        """Same result as `engine.compute_averages` over the session's posts."""
+        n = self.count
         return {
-            'likes': self.likes,
-            'saves': self.saves,
-            'comments': self.comments,
-            'shares': self.shares,
-            'follows': self.follows,
-            'profile_visits': self.profile_visits,
-            'caption_length': self.caption_length,
-            'hashtags': self.hashtags,
-            'reposts': self.reposts,
-            'predicted_impressions': self.predicted_impressions,
-            'viral_score': self.viral_score,
-            'eng_rate': self.eng_rate,
-            'follow_rate': self.follow_rate,
-            'ai_viral_label': self.ai_viral_label,
+            'likes': round(self.sum_likes / n) if n else 0,
+            'saves': round(self.sum_saves / n) if n else 0,
+            'comments': round(self.sum_comments / n) if n else 0,
+            'shares': round(self.sum_shares / n) if n else 0,
+            # impressions are never negative, so the sum over all posts is the sum over the > 0 ones
+            'impressions': round(self.sum_impressions / self.imp_count) if self.imp_count else 0,
         }
@@ -1,22 +1,55 @@
-import json
+import asyncio
+import hashlib
 import os
+import re
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
 import httpx
-from django.http import JsonResponse
+import orjson
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import render
 from django.conf import settings
+from django.db import transaction
 
-from .models import Post
-from .engine import (
-    predict_impressions,
-    compute_viral_score,
-    compute_engagement_rate,
-    compute_follow_rate,
-    compute_averages,
-    generate_ai_strategy,
-    build_forecast_report,
-)
+from .models import Post, SessionStats
+
+
+class OrjsonResponse(HttpResponse):
+    """JsonResponse equivalent serialised with orjson (handles numpy and datetime values)."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY), **kwargs)
+
+
+# Agent history is re-read on every chat turn; keep it warm while the session is unchanged
+AGENT_POSTS_TTL = 300  # seconds
+AGENT_REPLY_TTL = 3600  # seconds; Groq replies for an unchanged prompt + conversation
+
+
+def _agent_posts_key(session_key: str) -> str:
+    return f'posts:{session_key}'
+
+
+def _agent_prompt_key(session_key: str, stats: dict, extra_context: dict) -> str:
+    # The SessionStats version pins the history; the digest pins the ML context the client sent
+    stats_id, count = stats['version']
+    digest = hashlib.sha1(orjson.dumps(extra_context, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    return f'prompt:{session_key}:{stats_id}:{count}:{digest}'
+
+
+def _agent_reply_key(system_prompt: str, messages: list) -> str:
+    # Earlier turns are part of the key, not just the latest message
+    h = hashlib.sha256(system_prompt.encode())
+    h.update(b'\x1e')
+    h.update(orjson.dumps(messages))
+    return 'agent:' + h.hexdigest()
 
 
 def index(request):
@@ -26,16 +59,61 @@ def index(request):
 
 # ── /api/analyze/ ─────────────────────────────────────────────────────────────
 
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+_VIRAL_TENTHS_MAX = 3276.7  # int16 range in tenths
+
+
+def _valid_extra_posts(extra_posts) -> bool:
+    """
+    CSV rows come from the client and are packed into HistoryColumns (int64 counts,
+    viral_score as int16 tenths), so every value must be a real number that fits
+    its column. NaN and infinity fail the range checks.
+    """
+    from .engine import HISTORY_COLUMNS
+
+    if not isinstance(extra_posts, list):
+        return False
+    for post in extra_posts:
+        if not isinstance(post, dict):
+            return False
+        for k in HISTORY_COLUMNS:
+            v = post.get(k, 0)
+            if isinstance(v, bool) or not isinstance(v, (int, float)):
+                return False
+        if not all(_INT64_MIN <= post.get(k, 0) <= _INT64_MAX for k in HISTORY_COLUMNS[:-1]):
+            return False
+        if not abs(post.get('viral_score', 0)) <= _VIRAL_TENTHS_MAX:
+            return False
+    return True
+
+
 @csrf_exempt
 @require_http_methods(['POST'])
 def analyze(request):
+    # Imported here so workers that only serve history/clear/agent never load
+    # numpy or build the engine's lookup tables; later calls hit sys.modules.
+    from .engine import (
+        predict_impressions,
+        compute_viral_score,
+        compute_engagement_rate,
+        compute_follow_rate,
+        compute_averages,
+        get_best_times,
+        generate_ai_strategy,
+        build_forecast_report,
+        HistoryColumns,
+        HISTORY_COLUMNS,
+    )
+
     try:
-        body = json.loads(request.body)
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        body = orjson.loads(request.body)
+    except orjson.JSONDecodeError:
+        return OrjsonResponse({'error': 'Invalid JSON'}, status=400)
 
     session_key = body.get('session_key', 'anonymous')
     extra_posts = body.get('extra_posts', [])
+    if not _valid_extra_posts(extra_posts):
+        return OrjsonResponse({'error': 'Invalid extra_posts'}, status=400)
 
     inputs = {
         'likes': int(body.get('likes', 0)),
@@ -49,42 +127,40 @@ def analyze(request):
         'reposts': int(body.get('reposts', 0)),
     }
 
-    db_posts = list(
+    # DB rows go straight from tuples into columns; no per-row dicts
+    db_rows = list(
         Post.objects.filter(session_key=session_key)
         .order_by('created_at')
-        .values()
+        .values_list(*HISTORY_COLUMNS)
     )
+    history = HistoryColumns.from_rows(db_rows)
+    if extra_posts:
+        history = HistoryColumns.from_dicts(extra_posts).concat(history)
 
-    all_history = extra_posts + [
-        {
-            'likes': p['likes'], 'saves': p['saves'], 'comments': p['comments'],
-            'shares': p['shares'], 'follows': p['follows'],
-            'predicted_impressions': p['predicted_impressions'],
-            'viral_score': p['viral_score'],
-            'hashtags': p['hashtags'],
-        }
-        for p in db_posts
-    ]
-
-    impressions = predict_impressions(inputs, all_history)
+    impressions = predict_impressions(inputs, history)
     viral_score = compute_viral_score(inputs)
     eng_rate = compute_engagement_rate(inputs, impressions)
     follow_rate = compute_follow_rate(inputs)
-    avgs = compute_averages(all_history)
-    ai = generate_ai_strategy(inputs, viral_score, impressions, avgs)
-    forecast_report = build_forecast_report(all_history, inputs, impressions)
-
-    post = Post.objects.create(
-        session_key=session_key,
-        **inputs,
-        predicted_impressions=impressions,
-        viral_score=viral_score,
-        eng_rate=eng_rate,
-        follow_rate=follow_rate,
-        ai_viral_label=ai.get('viral_label', ''),
-    )
+    # CSV-uploaded posts only exist in this request, so they can't be averaged in SQL
+    avgs = compute_averages(history) if extra_posts else SessionStats.for_session(session_key).averages()
+    times = get_best_times(inputs)
+    ai = generate_ai_strategy(inputs, viral_score, impressions, avgs, times=times)
+    forecast_report = build_forecast_report(history, inputs, impressions)
+
+    with transaction.atomic():
+        post = Post.objects.create(
+            session_key=session_key,
+            **inputs,
+            predicted_impressions=impressions,
+            viral_score=viral_score,
+            eng_rate=eng_rate,
+            follow_rate=follow_rate,
+            ai_viral_label=ai.get('viral_label', ''),
+        )
+        SessionStats.record(post)
+    history_count = len(db_rows) + 1
 
-    return JsonResponse({
+    return OrjsonResponse({
         'impressions': impressions,
         'viral_score': viral_score,
         'eng_rate': eng_rate,
@@ -94,7 +170,7 @@ def analyze(request):
         'inputs': inputs,
         'ai': ai,
         'forecast_report': forecast_report,
-        'history_count': Post.objects.filter(session_key=session_key).count(),
+        'history_count': history_count,
     })
 
 
@@ -104,11 +180,12 @@ def analyze(request):
 @require_http_methods(['POST'])
 def history(request):
     try:
-        body = json.loads(request.body)
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        body = orjson.loads(request.body)
+    except orjson.JSONDecodeError:
+        return OrjsonResponse({'error': 'Invalid JSON'}, status=400)
 
     session_key = body.get('session_key', 'anonymous')
+    # created_at is serialised by orjson directly, no per-row isoformat()
     posts = list(
         Post.objects.filter(session_key=session_key)
         .order_by('created_at')
@@ -118,12 +195,10 @@ def history(request):
             'predicted_impressions', 'viral_score', 'eng_rate',
             'follow_rate', 'ai_viral_label', 'created_at',
         )
+        .iterator(chunk_size=500)
     )
 
-    for p in posts:
-        p['created_at'] = p['created_at'].isoformat()
-
-    return JsonResponse({'posts': posts, 'count': len(posts)})
+    return OrjsonResponse({'posts': posts, 'count': len(posts)})
 
 
 # ── /api/clear/ ───────────────────────────────────────────────────────────────
@@ -132,21 +207,96 @@ def history(request):
 @require_http_methods(['POST'])
 def clear(request):
     try:
-        body = json.loads(request.body)
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        body = orjson.loads(request.body)
+    except orjson.JSONDecodeError:
+        return OrjsonResponse({'error': 'Invalid JSON'}, status=400)
 
     session_key = body.get('session_key', 'anonymous')
-    deleted, _ = Post.objects.filter(session_key=session_key).delete()
-    return JsonResponse({'deleted': deleted})
+    with transaction.atomic():
+        deleted, _ = Post.objects.filter(session_key=session_key).delete()
+        SessionStats.objects.filter(session_key=session_key).delete()
+    return OrjsonResponse({'deleted': deleted})
 
 
 # ── Agent context builder ──────────────────────────────────────────────────────
 
-def _build_agent_system_prompt(db_posts: list, extra_context: dict) -> str:
+AGENT_RECENT_POSTS = 20  # raw rows shown to the LLM, capped to avoid context bloat
+
+
+def _load_agent_stats(session_key: str):
+    """
+    Session means come from the running SessionStats totals; the recent-rows window,
+    best/worst post and the half-vs-half impression sums come from one streamed pass
+    over the history, so memory stays O(AGENT_RECENT_POSTS). Returns (stats, recent) where
+    `recent` is the last AGENT_RECENT_POSTS rows in chronological order; stats['version']
+    is the SessionStats.version() the numbers were computed at.
+    """
+    # One read transaction, so the totals and the streamed rows see the same snapshot
+    # even if analyze() commits a post in between
+    with transaction.atomic():
+        totals = SessionStats.for_session(session_key)
+        count = totals.count
+        stats = {'count': count, 'version': (totals.pk or 0, count)}
+        if not count:
+            return stats, []
+
+        stats.update(
+            likes=totals.sum_likes / count,
+            saves=totals.sum_saves / count,
+            comments=totals.sum_comments / count,
+            shares=totals.sum_shares / count,
+            follows=totals.sum_follows / count,
+            impressions=totals.sum_impressions / count,
+            viral_score=totals.sum_viral_score / count,
+            hashtags=totals.sum_hashtags / count,
+        )
+
+        recent = deque(maxlen=AGENT_RECENT_POSTS)
+        mid = count // 2
+        first_sum = second_sum = 0
+        rows = (
+            Post.objects.filter(session_key=session_key)
+            .order_by('created_at')
+            .values(
+                'likes', 'saves', 'comments', 'shares', 'follows',
+                'predicted_impressions', 'viral_score', 'ai_viral_label',
+                'hashtags', 'caption_length',
+            )
+            .iterator(chunk_size=500)
+        )
+        best = worst = None
+        best_imp = worst_imp = 0
+        for i, p in enumerate(rows):
+            imp = p['predicted_impressions']
+            if i < mid:
+                first_sum += imp
+            else:
+                second_sum += imp
+            # Strict comparisons keep the earliest post on ties, as max()/min() did
+            if best is None or imp > best_imp:
+                best, best_imp = p, imp
+            if worst is None or imp < worst_imp:
+                worst, worst_imp = p, imp
+            recent.append(p)
+    recent = list(recent)
+    stats['best'] = best
+    stats['worst'] = worst
+
+    # Impression trend inputs: half averages, or first/last post for short histories
+    if count >= 4:
+        stats['first_imp'] = first_sum / mid
+        stats['second_imp'] = second_sum / (count - mid)
+    else:
+        stats['first_imp'] = recent[0]['predicted_impressions']
+        stats['second_imp'] = recent[-1]['predicted_impressions']
+    return stats, recent
+
+
+def _build_agent_system_prompt(stats: dict, recent: list, extra_context: dict) -> str:
     """
     Builds a rich system prompt grounding the LLM in the user's actual data.
-    Called on every request so every turn has full context — no data loss across turns.
+    `stats` and `recent` come from `_load_agent_stats`. Sent in full on every
+    turn — the chat API is stateless, so every turn needs the full context.
     """
 
     base = """You are an expert Instagram growth strategist embedded inside the Instra analytics app.
@@ -156,29 +306,27 @@ Format key numbers like **1,234 impressions** in bold. Use bullet points for lis
 Never waffle. Never repeat the question back. Get straight to the insight.
 If the data supports a clear recommendation, make it confidently."""
 
-    if not db_posts:
+    count = stats['count']
+    if not count:
         return base + "\n\nNo post history yet — the user hasn't analyzed any posts this session."
 
-    count = len(db_posts)
-    avg_likes = sum(p['likes'] for p in db_posts) / count
-    avg_saves = sum(p['saves'] for p in db_posts) / count
-    avg_comments = sum(p['comments'] for p in db_posts) / count
-    avg_shares = sum(p['shares'] for p in db_posts) / count
-    avg_follows = sum(p['follows'] for p in db_posts) / count
-    avg_imp = sum(p['predicted_impressions'] for p in db_posts) / count
-    avg_score = sum(p['viral_score'] for p in db_posts) / count
-    avg_hashtags = sum(p['hashtags'] for p in db_posts) / count
+    avg_likes = stats['likes']
+    avg_saves = stats['saves']
+    avg_comments = stats['comments']
+    avg_shares = stats['shares']
+    avg_follows = stats['follows']
+    avg_imp = stats['impressions']
+    avg_score = stats['viral_score']
+    avg_hashtags = stats['hashtags']
     saves_to_likes = avg_saves / max(avg_likes, 1)
 
-    best = max(db_posts, key=lambda p: p['predicted_impressions'])
-    worst = min(db_posts, key=lambda p: p['predicted_impressions'])
+    best = stats['best']
+    worst = stats['worst']
 
     # Impression trend (first half vs second half)
-    imps = [p['predicted_impressions'] for p in db_posts]
+    first_avg = stats['first_imp']
+    second_avg = stats['second_imp']
     if count >= 4:
-        mid = count // 2
-        first_avg = sum(imps[:mid]) / mid
-        second_avg = sum(imps[mid:]) / (count - mid)
         if second_avg > first_avg * 1.05:
             imp_trend = f"IMPROVING (up {((second_avg/first_avg)-1)*100:.0f}% recent vs early)"
         elif second_avg < first_avg * 0.95:
@@ -186,7 +334,7 @@ If the data supports a clear recommendation, make it confidently."""
         else:
             imp_trend = "STABLE"
     elif count >= 2:
-        imp_trend = "IMPROVING" if imps[-1] > imps[0] else "DECLINING" if imps[-1] < imps[0] else "STABLE"
+        imp_trend = "IMPROVING" if second_avg > first_avg else "DECLINING" if second_avg < first_avg else "STABLE"
     else:
         imp_trend = "only 1 post — no trend yet"
 
@@ -226,16 +374,14 @@ FORECAST MODEL OUTPUT:
   Engagement consistency: {f.get('engagement_velocity', {}).get('consistency', 'N/A')}
   Optimal hashtag count (from your data): {f.get('opt_hashtags', 'N/A')}"""
 
-    # Per-post rows (capped at 20 to avoid context bloat)
-    recent = db_posts[-20:]
-    post_rows = []
-    for i, p in enumerate(recent, 1):
-        post_rows.append(
-            f"  Post {i}: likes={p['likes']}, saves={p['saves']}, comments={p['comments']}, "
-            f"shares={p['shares']}, follows={p['follows']}, impressions={p['predicted_impressions']:,}, "
-            f"viral_score={p['viral_score']}, hashtags={p['hashtags']}, caption_len={p['caption_length']}, "
-            f"label={p['ai_viral_label']}"
-        )
+    # Per-post rows (capped at AGENT_RECENT_POSTS to avoid context bloat)
+    post_rows = "\n".join(
+        f"  Post {i}: likes={p['likes']}, saves={p['saves']}, comments={p['comments']}, "
+        f"shares={p['shares']}, follows={p['follows']}, impressions={p['predicted_impressions']:,}, "
+        f"viral_score={p['viral_score']}, hashtags={p['hashtags']}, caption_len={p['caption_length']}, "
+        f"label={p['ai_viral_label']}"
+        for i, p in enumerate(recent, 1)
+    )
 
     system = f"""{base}
 
@@ -261,7 +407,7 @@ WORST POST: {worst['predicted_impressions']:,} impressions | viral score {worst[
 {forecast_section}
 
 RAW POST DATA (most recent {len(recent)} of {count}):
-{chr(10).join(post_rows)}
+{post_rows}
 ════════════════════════════════════════
 When answering, cite specific numbers from above. Be concrete and direct."""
 
@@ -270,13 +416,15 @@ When answering, cite specific numbers from above. Be concrete and direct."""
 
 # ── /api/agent/ ───────────────────────────────────────────────────────────────
 
-@csrf_exempt
-@require_http_methods(['POST'])
-def agent(request):
+async def agent(request):
+    # Async so the worker is free while Groq generates. csrf_exempt and
+    # require_http_methods only wrap sync views before Django 5.0, hence the manual check.
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
     try:
-        body = json.loads(request.body)
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        body = orjson.loads(request.body)
+    except orjson.JSONDecodeError:
+        return OrjsonResponse({'error': 'Invalid JSON'}, status=400)
 
     user_message = body.get('message', '').strip()
     history_msgs = body.get('history', [])   # previous turns [{role, content}]
@@ -290,21 +438,25 @@ def agent(request):
     }
 
     if not user_message:
-        return JsonResponse({'error': 'No message provided'}, status=400)
-
-    # Fetch post history
-    db_posts = list(
-        Post.objects.filter(session_key=session_key)
-        .order_by('created_at')
-        .values(
-            'likes', 'saves', 'comments', 'shares', 'follows',
-            'profile_visits', 'predicted_impressions', 'viral_score',
-            'ai_viral_label', 'hashtags', 'caption_length',
-        )
-    )
-
-    # Build rich system prompt — always contains full data, every turn
-    system_prompt = _build_agent_system_prompt(db_posts, extra_context)
+        return OrjsonResponse({'error': 'No message provided'}, status=400)
+
+    # Reduce post history (cached between turns). The cache is per process, so an entry
+    # is only used while it matches the session's current SessionStats version.
+    posts_key = _agent_posts_key(session_key)
+    version = await sync_to_async(SessionStats.version)(session_key)
+    agent_stats = await cache.aget(posts_key)
+    if agent_stats is None or agent_stats[0]['version'] != version:
+        agent_stats = await sync_to_async(_load_agent_stats)(session_key)
+        await cache.aset(posts_key, agent_stats, AGENT_POSTS_TTL)
+    stats, recent = agent_stats
+
+    # Build rich system prompt — always contains full data, every turn.
+    # Reused across turns while neither the history nor the ML context changes.
+    prompt_key = _agent_prompt_key(session_key, stats, extra_context)
+    system_prompt = await cache.aget(prompt_key)
+    if system_prompt is None:
+        system_prompt = _build_agent_system_prompt(stats, recent, extra_context)
+        await cache.aset(prompt_key, system_prompt, AGENT_POSTS_TTL)
 
     # Build conversation history (previous turns only, no data injection needed —
     # the system prompt handles grounding for every turn)
@@ -321,42 +473,133 @@ def agent(request):
     api_key = getattr(settings, 'GROQ_API_KEY', '') or os.environ.get('GROQ_API_KEY', '')
 
     if not api_key:
-        reply = _fallback_agent_response(user_message, db_posts)
-        return JsonResponse({'reply': reply})
+        reply = _fallback_agent_response(user_message, stats)
+        return OrjsonResponse({'reply': reply})
+
+    # Same data and same conversation answered recently: replay it, no Groq call
+    reply_key = _agent_reply_key(system_prompt, messages)
+    cached_reply = await cache.aget(reply_key)
+    if cached_reply is not None:
+        stream = _replay_reply(cached_reply)
+    else:
+        # Relay tokens as they arrive instead of waiting for the whole completion
+        stream = _stream_groq_reply(
+            api_key, system_prompt, messages, user_message, stats, reply_key,
+            pooled=isinstance(request, ASGIRequest),
+        )
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+    return response
+
+
+agent.csrf_exempt = True
+
+
+# ── Groq streaming ─────────────────────────────────────────────────────────────
+
+GROQ_URL = 'https://api.groq.com/openai/v1/chat/completions'
 
+_CLIENT_OPTIONS = {
+    'http2': True,
+    'timeout': 30,
+    'limits': httpx.Limits(max_keepalive_connections=20, max_connections=40),
+}
+
+# One pooled AsyncClient per event loop, so the TCP/TLS connection to Groq is kept
+# alive and reused. Under ASGI that is a single client for the whole process.
+_HTTP = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def _groq_client(pooled: bool):
+    """
+    The loop's pooled client under ASGI. Under WSGI every async view runs on a
+    throwaway event loop, so a pooled client could never be reused; use a
+    per-request client there and close it when the stream ends.
+    """
+    if not pooled:
+        async with httpx.AsyncClient(**_CLIENT_OPTIONS) as client:
+            yield client
+        return
+    loop = asyncio.get_running_loop()
+    client = _HTTP.get(loop)
+    if client is None:
+        client = _HTTP[loop] = httpx.AsyncClient(**_CLIENT_OPTIONS)
+    yield client
+
+
+def _sse(payload: dict) -> bytes:
+    return b'data: ' + orjson.dumps(payload) + b'\n\n'
+
+
+async def _replay_reply(reply: str):
+    yield _sse({'delta': reply})
+
+
+async def _stream_groq_reply(
+    api_key: str, system_prompt: str, messages: list, user_message: str, stats: dict, reply_key: str,
+    pooled: bool,
+):
+    """
+    Yields the Groq completion as `data: {"delta": ...}` SSE events and caches the
+    complete reply under `reply_key`. If the request fails before any text was sent,
+    the rule-based reply is sent instead (and not cached).
+    """
+    parts = []
     try:
-        with httpx.Client(timeout=30) as client:
-            resp = client.post(
-                'https://api.groq.com/openai/v1/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {api_key}',
-                    'Content-Type': 'application/json',
-                },
-                json={
-                    'model': 'llama-3.3-70b-versatile',
-                    'max_tokens': 1024,  # was 600 — enough for a 7-day plan
-                    'temperature': 0.7,
-                    'messages': [
-                        {'role': 'system', 'content': system_prompt},
-                        *messages,
-                    ],
-                },
-            )
+        async with _groq_client(pooled) as client, client.stream(
+            'POST',
+            GROQ_URL,
+            headers={
+                'Authorization': f'Bearer {api_key}',
+                'Content-Type': 'application/json',
+            },
+            json={
+                'model': 'llama-3.3-70b-versatile',
+                'max_tokens': 1024,  # was 600 — enough for a 7-day plan
+                'temperature': 0.7,
+                'stream': True,
+                'messages': [
+                    {'role': 'system', 'content': system_prompt},
+                    *messages,
+                ],
+            },
+        ) as resp:
             resp.raise_for_status()
-            data = resp.json()
-            reply = data['choices'][0]['message']['content']
-    except Exception as e:
-        reply = _fallback_agent_response(user_message, db_posts)
-
-    return JsonResponse({'reply': reply})
+            async for line in resp.aiter_lines():
+                if not line.startswith('data: '):
+                    continue
+                data = line[6:]
+                if data == '[DONE]':
+                    break
+                delta = orjson.loads(data)['choices'][0]['delta'].get('content')
+                if delta:
+                    parts.append(delta)
+                    yield _sse({'delta': delta})
+        if parts:
+            await cache.aset(reply_key, ''.join(parts), AGENT_REPLY_TTL)
+    except Exception:
+        if not parts:
+            yield _sse({'delta': _fallback_agent_response(user_message, stats)})
 
 
 # ── Fallback (no API key) ──────────────────────────────────────────────────────
 
-def _fallback_agent_response(message: str, posts: list) -> str:
+# Keyword routes, in priority order, matched as plain substrings of the lower-cased message
+_ROUTE_PRIORITY = ('save', 'plan', 'follow', 'hashtag')
+_ROUTE_RE = re.compile(
+    r'(?P<save>save)'
+    r'|(?P<plan>next|plan|calendar|content|post)'
+    r'|(?P<follow>follow)'
+    r'|(?P<hashtag>hashtag)'
+)
+
+
+def _fallback_agent_response(message: str, stats: dict) -> str:
     """Rule-based fallback when no API key is configured."""
-    msg = message.lower()
-    count = len(posts)
+    count = stats['count']
 
     if count == 0:
         return (
@@ -365,14 +608,18 @@ def _fallback_agent_response(message: str, posts: list) -> str:
             "signal on Instagram right now. Add a 'save this' CTA to every caption."
         )
 
-    avg_saves = sum(p['saves'] for p in posts) / count
-    avg_likes = sum(p['likes'] for p in posts) / count
-    avg_score = sum(p['viral_score'] for p in posts) / count
-    avg_imp = sum(p['predicted_impressions'] for p in posts) / count
-    best_post = max(posts, key=lambda p: p['predicted_impressions'])
+    avg_saves = stats['saves']
+    avg_likes = stats['likes']
+    avg_score = stats['viral_score']
+    avg_imp = stats['impressions']
+    best_post = stats['best']
     saves_ratio = avg_saves / max(avg_likes, 1)
 
-    if 'save' in msg:
+    # One scan over the message; no keyword can overlap one from another route
+    found = {m.lastgroup for m in _ROUTE_RE.finditer(message.lower())}
+    route = next((r for r in _ROUTE_PRIORITY if r in found), None)
+
+    if route == 'save':
         if saves_ratio < 0.3:
             return (
                 f"Your saves-to-likes ratio is **{saves_ratio:.2f}** — that's low. "
@@ -386,7 +633,7 @@ def _fallback_agent_response(message: str, posts: list) -> str:
             "consistently earn saves."
         )
 
-    if any(w in msg for w in ['next', 'plan', 'calendar', 'content', 'post']):
+    if route == 'plan':
         return (
             f"Based on your **{count} posts**: avg viral score **{avg_score:.1f}/100**, "
             f"avg **{avg_imp:,.0f} impressions**. Your best post hit "
@@ -396,15 +643,15 @@ def _fallback_agent_response(message: str, posts: list) -> str:
             "and add a saves CTA to every caption."
         )
 
-    if 'follow' in msg:
+    if route == 'follow':
         return (
             "To convert visitors into followers: (1) Your bio headline should state your value "
             "in 6 words or fewer. (2) Pin your 3 best-performing posts. "
             "(3) Grid visual consistency matters more than any single post."
         )
 
-    if 'hashtag' in msg:
-        avg_tags = sum(p['hashtags'] for p in posts) / count
+    if route == 'hashtag':
+        avg_tags = stats['hashtags']
         return (
             f"You're averaging **{avg_tags:.0f} hashtags** per post. "
             "Sweet spot: 15–20 niche-specific tags. Mix: 5 tiny niche tags (under 50K posts), "
@@ -38,11 +38,19 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'instra.wsgi.application'
+ASGI_APPLICATION = 'instra.asgi.application'
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # WSGI deployments only: reuses each worker's connection (and its pragmas)
+        # across requests. Django 4.2's ASGI handler runs each request's sync code on a
+        # new thread, so under ASGI every request opens its own connection regardless.
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': 20,  # seconds to wait on a locked database before failing
+        },
     }
 }
 